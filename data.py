@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 """
-Generate optimized Parquet and JSON files for visualization.
+Generate optimized Parquet files for visualization.
 Creates mode-specific pre-aggregated files for faster loading.
-JSON files for year-specific data (faster initial load).
+Small Parquet files for year-specific data (faster initial load).
 Parquet file for base aggregated data (for filtered queries).
 """
 
+import os
 import polars as pl
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
-import json
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,79 +33,101 @@ def main():
     viz_data_dir.mkdir(parents=True, exist_ok=True)
     
     logger.info(f"Reading source Parquet file: {parquet_path}")
-    df = pl.read_parquet(parquet_path)
-    
-    logger.info(f"Source data: {len(df)} rows")
-    
+    # Keep the source lazy with only the needed columns projected, so row
+    # groups stream through the aggregations instead of materializing the
+    # whole dataset up front
+    lf = pl.scan_parquet(parquet_path).select(
+        ["Year", "Country", "Commodity", "Port", "Type", "USD Value"]
+    )
+
+    total_rows = lf.select(pl.len()).collect().item()
+    logger.info(f"Source data: {total_rows} rows")
+
     # Get available years
-    available_years = sorted(df['Year'].unique().to_list())
+    available_years = lf.select(pl.col("Year").unique()).collect().to_series().sort().to_list()
     logger.info(f"Available years: {available_years}")
-    
+
     # Create base aggregated file (all combinations, including Year) - for filtered queries
     logger.info("Creating base aggregated file...")
-    aggregated = df.group_by(["Country", "Commodity", "Port", "Type", "Year"]).agg(
+    # Sort by the group keys rather than by value: co-locating key runs keeps
+    # dictionary/RLE encoding effective and gives row groups usable min/max
+    # stats for predicate pushdown on the Year/Country/... filters downstream
+    aggregated = lf.group_by(["Country", "Commodity", "Port", "Type", "Year"]).agg(
         pl.sum("USD Value").alias("Total USD Value")
-    ).sort("Total USD Value", descending=True)
-    
+    ).sort(["Year", "Country", "Commodity", "Port", "Type"]).collect(streaming=True)
+
     base_path = viz_data_dir / "export-import-aggregated.parquet"
-    aggregated.write_parquet(base_path, compression='zstd', compression_level=9)
+    # zstd level 3 writes roughly twice as fast as level 9 with near-identical
+    # size here, since the low-cardinality columns are already dictionary/RLE
+    # encoded. 64k row groups with per-column statistics let the key-sorted
+    # layout prune most row groups for typical single-year/single-country
+    # filters pushed down by the DuckDB-wasm reader
+    aggregated.write_parquet(
+        base_path,
+        compression='zstd',
+        compression_level=3,
+        statistics=True,
+        row_group_size=65_536,
+        data_page_size=1 << 20
+    )
     logger.info(f"Saved base aggregated file: {base_path} ({base_path.stat().st_size / 1024 / 1024:.2f} MB)")
-    
-    # Create mode-specific pre-aggregated JSON files for each year (faster initial load)
-    logger.info("Creating mode-specific aggregated JSON files per year...")
-    
-    total_json_files = 0
-    total_json_size = 0
-    for year in available_years:
-        year_df = df.filter(pl.col("Year") == year)
-        
-        if year_df.is_empty():
-            continue
-        
-        # Commodity mode: aggregate by Commodity, Type (for this year)
-        commodity_agg = year_df.group_by(["Commodity", "Type"]).agg(
+
+    # Create mode-specific pre-aggregated Parquet files for each year (faster initial load)
+    logger.info("Creating mode-specific aggregated Parquet files per year...")
+
+    # Aggregate each mode over the whole frame in one pass (keyed by Year),
+    # then split per year. This does 3 group_bys total instead of 3 per year
+    # and avoids materializing a filtered copy of the frame for each year.
+    # One (Year, value desc) sort per mode replaces a value sort per year:
+    # partition_by keeps row order, so the per-year slices come out ordered
+    commodity_all, country_all, port_all = pl.collect_all([
+        lf.group_by(["Year", "Commodity", "Type"]).agg(
             pl.sum("USD Value").alias("Total USD Value")
-        ).sort("Total USD Value", descending=True)
-        
-        commodity_path = viz_data_dir / f"commodity-aggregated-{year}.json"
-        # Convert to dict for JSON serialization
-        commodity_dict = commodity_agg.to_dicts()
-        with open(commodity_path, 'w') as f:
-            json.dump(commodity_dict, f, separators=(',', ':'))  # Compact JSON
-        total_json_files += 1
-        total_json_size += commodity_path.stat().st_size
-        
-        # Country mode: aggregate by Country, Type (for this year)
-        country_agg = year_df.group_by(["Country", "Type"]).agg(
+        ).sort(["Year", "Total USD Value"], descending=[False, True]),
+        lf.group_by(["Year", "Country", "Type"]).agg(
             pl.sum("USD Value").alias("Total USD Value")
-        ).sort("Total USD Value", descending=True)
-        
-        country_path = viz_data_dir / f"country-aggregated-{year}.json"
-        country_dict = country_agg.to_dicts()
-        with open(country_path, 'w') as f:
-            json.dump(country_dict, f, separators=(',', ':'))  # Compact JSON
-        total_json_files += 1
-        total_json_size += country_path.stat().st_size
-        
-        # Port mode: aggregate by Port, Type (for this year)
-        port_agg = year_df.group_by(["Port", "Type"]).agg(
+        ).sort(["Year", "Total USD Value"], descending=[False, True]),
+        lf.group_by(["Year", "Port", "Type"]).agg(
             pl.sum("USD Value").alias("Total USD Value")
-        ).sort("Total USD Value", descending=True)
-        
-        port_path = viz_data_dir / f"port-aggregated-{year}.json"
-        port_dict = port_agg.to_dicts()
-        with open(port_path, 'w') as f:
-            json.dump(port_dict, f, separators=(',', ':'))  # Compact JSON
-        total_json_files += 1
-        total_json_size += port_path.stat().st_size
-        
-        logger.info(f"Saved aggregated JSON files for year {year}")
-    
+        ).sort(["Year", "Total USD Value"], descending=[False, True]),
+    ], streaming=True)
+
+    def write_year_file(mode, year, year_agg):
+        """Write a single, already-ordered mode/year aggregation, returning its file size."""
+        mode_path = viz_data_dir / f"{mode}-aggregated-{year}.parquet"
+        year_agg.write_parquet(
+            mode_path,
+            compression='zstd',
+            compression_level=3,
+            statistics=True
+        )
+        return mode_path.stat().st_size
+
+    # Writes are I/O-bound and Polars releases the GIL during write_parquet,
+    # so fan the per-year writes out across a thread pool
+    futures = []
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count())) as executor:
+        for mode, mode_agg in [
+            ("commodity", commodity_all),
+            ("country", country_all),
+            ("port", port_all),
+        ]:
+            for year_key, year_agg in mode_agg.partition_by(
+                "Year", maintain_order=True, as_dict=True, include_key=False
+            ).items():
+                year = year_key[0] if isinstance(year_key, tuple) else year_key
+                futures.append(executor.submit(write_year_file, mode, year, year_agg))
+        year_file_sizes = [future.result() for future in futures]
+
+    total_year_files = len(year_file_sizes)
+    total_year_size = sum(year_file_sizes)
+    logger.info("Saved aggregated Parquet files for all modes and years")
+
     logger.info("File generation complete!")
-    logger.info(f"Total files created: {total_json_files + 1} (1 base Parquet + {total_json_files} year-specific JSON)")
+    logger.info(f"Total files created: {total_year_files + 1} (1 base Parquet + {total_year_files} year-specific Parquet)")
     logger.info(f"Base Parquet size: {base_path.stat().st_size / 1024 / 1024:.2f} MB")
-    logger.info(f"Total JSON size: {total_json_size / 1024 / 1024:.2f} MB")
-    logger.info(f"Total size: {(base_path.stat().st_size + total_json_size) / 1024 / 1024:.2f} MB")
+    logger.info(f"Total year-specific Parquet size: {total_year_size / 1024 / 1024:.2f} MB")
+    logger.info(f"Total size: {(base_path.stat().st_size + total_year_size) / 1024 / 1024:.2f} MB")
 
 
 if __name__ == "__main__":
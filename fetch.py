@@ -5,11 +5,11 @@ Downloads data going back in time from the previous month until both import and
 """
 
 import os
-import io
 import logging
 import requests
+import shutil
 import time
-import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from calendar import month_abbr
 from pathlib import Path
@@ -22,6 +22,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Shared session so the TCP+TLS connection is kept alive across requests
+SESSION = requests.Session()
+
 
 def get_month_string(date):
     """Convert a date to the format used in the URL (e.g., 'Nov-2021')."""
@@ -31,15 +34,15 @@ def get_month_string(date):
 
 def fetch_month_data(year, month, data_type='import'):
     """
-    Fetch data for a specific month.
-    
+    Fetch data for a specific month, streaming it to raw/{data_type}/$year/$month.zip.
+
     Args:
         year: Integer year
         month: Integer month (1-12)
         data_type: 'import' or 'export'
-    
+
     Returns:
-        bytes: The zip file content if successful, None otherwise
+        bool: True if the zip file was downloaded and saved, False otherwise
     """
     date = datetime(year, month, 1)
     month_str = get_month_string(date)
@@ -64,50 +67,53 @@ def fetch_month_data(year, month, data_type='import'):
     
     try:
         logger.info(f"Fetching {data_type} data for {month_str}...")
-        response = requests.get(url, timeout=30)
-        
-        if response.status_code != 200:
-            logger.warning(f"Failed to fetch {data_type} data for {month_str} (HTTP {response.status_code})")
-            return None
-        
-        # Check if response is a valid zip file
-        content = response.content
-        if len(content) < 4:
-            logger.warning(f"Failed to fetch {data_type} data for {month_str} (empty response)")
-            return None
-        
-        # Check zip file magic number (PK\x03\x04)
-        if content[:2] != b'PK':
-            logger.warning(f"Failed to fetch {data_type} data for {month_str} (not a zip file)")
-            return None
-        
-        # Try to validate it's a proper zip file
-        try:
-            zipfile.ZipFile(io.BytesIO(content))
-            logger.info(f"Successfully fetched {data_type} data for {month_str}")
-            return content
-        except zipfile.BadZipFile:
+        with SESSION.get(url, timeout=30, stream=True) as response:
+            if response.status_code != 200:
+                logger.warning(f"Failed to fetch {data_type} data for {month_str} (HTTP {response.status_code})")
+                return False
+
+            # Check zip file magic number (PK\x03\x04) before writing anything
+            head = response.raw.read(4)
+            if len(head) < 4:
+                logger.warning(f"Failed to fetch {data_type} data for {month_str} (empty response)")
+                return False
+            if head != b'PK\x03\x04':
+                logger.warning(f"Failed to fetch {data_type} data for {month_str} (not a zip file)")
+                return False
+
+            raw_dir = Path("raw") / data_type / str(year)
+            raw_dir.mkdir(parents=True, exist_ok=True)
+            file_path = raw_dir / f"{month:02d}.zip"
+            tmp_path = file_path.with_suffix('.zip.part')
+
+            # Stream the body straight to disk instead of buffering the
+            # whole zip in memory
+            with open(tmp_path, 'wb') as f:
+                f.write(head)
+                shutil.copyfileobj(response.raw, f, length=1 << 20)
+
+        # Check for the end-of-central-directory signature, which the zip
+        # spec places in the last 64KiB; cheaper than parsing the whole
+        # central directory with zipfile just to decide validity
+        with open(tmp_path, 'rb') as f:
+            f.seek(max(0, tmp_path.stat().st_size - 65536))
+            tail = f.read()
+        if b'PK\x05\x06' not in tail:
             logger.warning(f"Failed to fetch {data_type} data for {month_str} (invalid zip file)")
-            return None
-            
+            tmp_path.unlink()
+            return False
+
+        os.replace(tmp_path, file_path)
+        logger.info(f"Successfully fetched {data_type} data for {month_str}")
+        logger.info(f"Saved to {file_path}")
+        return True
+
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to fetch {data_type} data for {month_str} (request error: {e})")
-        return None
+        return False
     except Exception as e:
         logger.error(f"Failed to fetch {data_type} data for {month_str} (unexpected error: {e})")
-        return None
-
-
-def save_zip_file(content, year, month, data_type='import'):
-    """Save zip file content to raw/{data_type}/$year/$month.zip"""
-    raw_dir = Path("raw") / data_type / str(year)
-    raw_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_path = raw_dir / f"{month:02d}.zip"
-    with open(file_path, "wb") as f:
-        f.write(content)
-    
-    logger.info(f"Saved to {file_path}")
+        return False
 
 
 def main():
@@ -124,44 +130,50 @@ def main():
     max_consecutive_failures = 5
     
     logger.info(f"Starting fetch from {get_month_string(current_date)} going back in time...")
-    
-    while min(consecutive_failures.values()) < max_consecutive_failures:
-        year = current_date.year
-        month = current_date.month
-        month_str = get_month_string(current_date)
-        
-        # Track if we made any requests this iteration
-        made_request = False
-        
-        # Fetch both import and export data
-        for data_type in ['import', 'export']:
-            # Check if file already exists - avoid refetching
-            file_path = Path("raw") / data_type / str(year) / f"{month:02d}.zip"
-            if file_path.exists():
-                logger.info(f"Skipping {data_type} data for {month_str} (already exists at {file_path})")
-                consecutive_failures[data_type] = 0  # Reset counter if we skip
-            else:
-                # File doesn't exist, fetch it
-                made_request = True
-                content = fetch_month_data(year, month, data_type)
-                
-                if content:
-                    save_zip_file(content, year, month, data_type)
-                    consecutive_failures[data_type] = 0  # Reset counter on success
+
+    # Import and export target the same host, so fetch them concurrently
+    # over the keep-alive session; politeness sleep stays once per month
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        while min(consecutive_failures.values()) < max_consecutive_failures:
+            year = current_date.year
+            month = current_date.month
+            month_str = get_month_string(current_date)
+
+            # Skip data types whose file already exists - avoid refetching
+            to_fetch = []
+            for data_type in ['import', 'export']:
+                file_path = Path("raw") / data_type / str(year) / f"{month:02d}.zip"
+                if file_path.exists():
+                    logger.info(f"Skipping {data_type} data for {month_str} (already exists at {file_path})")
+                    consecutive_failures[data_type] = 0  # Reset counter if we skip
                 else:
-                    consecutive_failures[data_type] += 1
-                    logger.warning(f"Consecutive failures for {data_type}: {consecutive_failures[data_type]}/{max_consecutive_failures}")
-        
-        # Move to previous month
-        if current_date.month == 1:
-            current_date = datetime(current_date.year - 1, 12, 1)
-        else:
-            current_date = datetime(current_date.year, current_date.month - 1, 1)
-        
-        # Only wait if we made a request (to be respectful to the server)
-        if made_request:
-            logger.debug("Waiting for 10 seconds before next request...")
-            time.sleep(10)
+                    to_fetch.append(data_type)
+
+            # Track if we made any requests this iteration
+            made_request = bool(to_fetch)
+
+            if to_fetch:
+                results = executor.map(
+                    lambda data_type: (data_type, fetch_month_data(year, month, data_type)),
+                    to_fetch
+                )
+                for data_type, success in results:
+                    if success:
+                        consecutive_failures[data_type] = 0  # Reset counter on success
+                    else:
+                        consecutive_failures[data_type] += 1
+                        logger.warning(f"Consecutive failures for {data_type}: {consecutive_failures[data_type]}/{max_consecutive_failures}")
+
+            # Move to previous month
+            if current_date.month == 1:
+                current_date = datetime(current_date.year - 1, 12, 1)
+            else:
+                current_date = datetime(current_date.year, current_date.month - 1, 1)
+
+            # Only wait if we made a request (to be respectful to the server)
+            if made_request:
+                logger.debug("Waiting for 10 seconds before next request...")
+                time.sleep(10)
     
     logger.info(f"Stopped after {max_consecutive_failures} consecutive failures for both import and export.")
 
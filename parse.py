@@ -8,11 +8,11 @@ Uses Polars for high-performance data processing with parallel processing for op
 import logging
 import zipfile
 import polars as pl
-import pandas as pd
 from pathlib import Path
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Pool, cpu_count
-from functools import partial
+from functools import lru_cache, partial
 from tqdm import tqdm
 
 # Configure logging
@@ -27,13 +27,20 @@ logger = logging.getLogger(__name__)
 def find_column_indices(header_row):
     """
     Find column indices from header row.
-    
+
     Args:
         header_row: List of header values
-    
+
     Returns:
         dict: Column indices for commodity, country, port, unit, qty, inr, usd
     """
+    # Headers are near-identical across the thousands of sheets, so memoize
+    # the substring search on the stringified header tuple
+    return dict(_find_column_indices_cached(tuple(str(val) for val in header_row)))
+
+
+@lru_cache(maxsize=64)
+def _find_column_indices_cached(header_row):
     indices = {
         'commodity': None,
         'country': None,
@@ -67,33 +74,6 @@ def find_column_indices(header_row):
     return indices
 
 
-def parse_numeric_series(series):
-    """Vectorized parsing of numeric values from a pandas Series."""
-    return pd.to_numeric(series, errors='coerce')
-
-
-def detect_excel_format(xls_data):
-    """
-    Detect Excel file format from file header bytes.
-    
-    Args:
-        xls_data: Bytes content of the Excel file
-    
-    Returns:
-        str: 'xlsx' or 'xls' or None if unknown
-    """
-    if len(xls_data) < 8:
-        return None
-    
-    # XLSX files start with PK (ZIP signature)
-    if xls_data[:2] == b'PK':
-        return 'xlsx'
-    # XLS files start with specific OLE2 signature
-    elif xls_data[:8] == b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1':
-        return 'xls'
-    return None
-
-
 def parse_xls_file(xls_data, year, month, data_type='import'):
     """
     Parse a single XLS file and return a Polars DataFrame using vectorized operations.
@@ -109,144 +89,94 @@ def parse_xls_file(xls_data, year, month, data_type='import'):
         Polars DataFrame with parsed data
     """
     try:
-        # Detect file format and choose appropriate engine
-        file_format = detect_excel_format(xls_data)
-        
-        # Try to read with appropriate engine, fallback to auto-detect
-        read_kwargs = {
-            'io': BytesIO(xls_data),
-            'header': None,
-            'dtype': str,
-            'na_values': ['', 'N/A', 'n/a', 'NULL', 'null'],
-            'keep_default_na': False
-        }
-        
-        # Set engine based on detected format
-        if file_format == 'xlsx':
-            read_kwargs['engine'] = 'openpyxl'
-        elif file_format == 'xls':
-            # Use xlrd engine for .xls files (requires xlrd<2.0)
-            # Check if xlrd is available
-            try:
-                import xlrd
-                read_kwargs['engine'] = 'xlrd'
-            except ImportError:
-                logger.warning("xlrd not available for .xls files. Install with: pip install 'xlrd<2.0'")
-                # Will try auto-detect below
-        # If format is unknown, let pandas auto-detect (no engine specified)
-        
-        # Read Excel with optimized pandas settings
-        # Try with detected engine first, fallback to auto-detect on error
-        try:
-            df_pandas = pd.read_excel(**read_kwargs)
-        except Exception as e:
-            # If engine-specific read fails, try without specifying engine (auto-detect)
-            if 'engine' in read_kwargs:
-                logger.debug(f"Failed to read with {read_kwargs.get('engine', 'unknown')} engine, trying auto-detect: {e}")
-                read_kwargs.pop('engine', None)
-                try:
-                    df_pandas = pd.read_excel(**read_kwargs)
-                except Exception as e2:
-                    logger.error(f"Failed to read Excel file with auto-detect: {e2}")
-                    raise
-            else:
-                raise
-        
-        if df_pandas.empty or len(df_pandas) < 2:
+        # pl.read_excel with the calamine engine produces a Polars frame
+        # straight from the Rust parser, with no per-row Python objects.
+        # infer_schema_length=0 keeps every column Utf8 so all casts below
+        # stay explicit
+        df_raw = pl.read_excel(
+            BytesIO(xls_data),
+            engine='calamine',
+            has_header=False,
+            infer_schema_length=0
+        )
+
+        if len(df_raw) < 3:
             return pl.DataFrame()
-        
+
         # Row 0 is the title, Row 1 contains the actual column headers
-        header_row = df_pandas.iloc[1].tolist()
-        indices = find_column_indices(header_row)
-        
+        indices = find_column_indices(df_raw.row(1))
+
         # Check essential columns
         if indices['commodity'] is None or indices['country'] is None:
             logger.warning(f"Could not find essential columns. Found: commodity={indices['commodity']}, country={indices['country']}")
             return pl.DataFrame()
-        
+
+        def column(col_idx, name):
+            """Column at col_idx as Utf8, or a null column if it is missing."""
+            if col_idx is None or col_idx >= df_raw.width:
+                return pl.lit(None, dtype=pl.Utf8).alias(name)
+            return pl.nth(col_idx).alias(name)
+
+        def clean_str(name, default):
+            stripped = pl.col(name).str.strip_chars()
+            return (
+                pl.when(
+                    stripped.is_null() |
+                    (stripped == '') |
+                    (stripped.str.to_lowercase() == 'nan')
+                )
+                .then(pl.lit(default))
+                .otherwise(stripped)
+                .alias(name)
+            )
+
+        def to_int(name):
+            # Parse through Float64 first so decimal strings survive the
+            # cast, nulling out anything unparseable like pd.to_numeric
+            # (errors='coerce') once did
+            return pl.col(name).cast(pl.Float64, strict=False).cast(pl.Int64, strict=False)
+
         # Extract data starting from row 2 (skip title row 0 and header row 1)
-        data_df = df_pandas.iloc[2:].copy()
-        
-        if data_df.empty:
-            return pl.DataFrame()
-        
-        # Vectorized extraction of columns
-        # Find maximum column index needed
-        valid_indices = [i for i in indices.values() if i is not None]
-        if valid_indices:
-            max_col = max(valid_indices)
-            if max_col >= len(data_df.columns):
-                # Pad columns if needed
-                for i in range(len(data_df.columns), max_col + 1):
-                    data_df[i] = None
-        
-        # Extract commodity column and filter valid rows
-        commodity_col = data_df.iloc[:, indices['commodity']].astype(str).str.strip()
-        valid_mask = (
-            commodity_col.notna() & 
-            (commodity_col != '') & 
-            (~commodity_col.str.upper().isin(['COMMODITY', 'NAN', 'NONE', '']))
+        df = df_raw.slice(2).select([
+            column(indices['commodity'], 'Commodity'),
+            column(indices['country'], 'Country'),
+            column(indices['port'], 'Port'),
+            column(indices['qty'], 'Quantity'),
+            column(indices['unit'], 'Unit'),
+            column(indices['inr'], 'INR Value'),
+            column(indices['usd'], 'USD Value')
+        ])
+
+        # Drop repeated header rows and blank padding rows with a vectorized
+        # filter instead of a per-row Python mask
+        df = df.with_columns(
+            pl.col('Commodity').str.strip_chars()
+        ).filter(
+            pl.col('Commodity').is_not_null()
+            & (pl.col('Commodity') != '')
+            & ~pl.col('Commodity').str.to_uppercase().is_in(['COMMODITY', 'NAN', 'NONE'])
         )
-        
-        if not valid_mask.any():
+
+        if df.is_empty():
             return pl.DataFrame()
-        
-        data_df = data_df[valid_mask].copy()
-        commodity_col = commodity_col[valid_mask]
-        
-        # Vectorized extraction of string columns
-        def safe_str_extract(col_idx, default=''):
-            if col_idx is None:
-                return pd.Series([default] * len(data_df), index=data_df.index)
-            col = data_df.iloc[:, col_idx].astype(str).str.strip()
-            # Replace 'nan' strings (from pandas conversion) with default
-            col = col.replace('nan', default)
-            return col.fillna(default)
-        
-        country_col = safe_str_extract(indices['country'], '')
-        port_col = safe_str_extract(indices['port'], '')
-        # For Unit, use 'N/A' as default instead of empty string
-        unit_col = safe_str_extract(indices['unit'], 'N/A')
-        
-        # Vectorized parsing of numeric columns
-        def safe_numeric_extract(col_idx):
-            if col_idx is None:
-                return pd.Series([None] * len(data_df), index=data_df.index, dtype='float64')
-            col = data_df.iloc[:, col_idx]
-            return parse_numeric_series(col)
-        
-        qty_col = safe_numeric_extract(indices['qty'])
-        inr_col = safe_numeric_extract(indices['inr'])
-        usd_col = safe_numeric_extract(indices['usd'])
-        
-        # Convert data_type to proper format
-        import_export = 'Import' if data_type == 'import' else 'Export'
-        type_col = pd.Series([import_export] * len(data_df), index=data_df.index)
-        year_col = pd.Series([year] * len(data_df), index=data_df.index, dtype='int32')
-        month_col = pd.Series([month] * len(data_df), index=data_df.index, dtype='int32')
-        
-        # Create DataFrame directly from Series (much faster than row-by-row)
-        result_df = pd.DataFrame({
-            'Commodity': commodity_col,
-            'Country': country_col,
-            'Port': port_col,
-            'Year': year_col,
-            'Month': month_col,
-            'Type': type_col,
-            'Quantity': qty_col,
-            'Unit': unit_col,
-            'INR Value': inr_col,
-            'USD Value': usd_col
-        })
-        
-        # Convert to Polars with proper schema
-        return pl.from_pandas(result_df, schema_overrides={
-            'Year': pl.Int32,
-            'Month': pl.Int32,
-            'Quantity': pl.Int64,
-            'INR Value': pl.Int64,
-            'USD Value': pl.Int64
-        })
+
+        # Broadcast the constant per-file columns as literals instead of
+        # allocating an N-length Python list for each of them
+        return df.with_columns([
+            clean_str('Country', ''),
+            clean_str('Port', ''),
+            # For Unit, use 'N/A' as default instead of empty string
+            clean_str('Unit', 'N/A'),
+            to_int('Quantity'),
+            to_int('INR Value'),
+            to_int('USD Value'),
+            pl.lit(year, dtype=pl.Int32).alias('Year'),
+            pl.lit(month, dtype=pl.Int32).alias('Month'),
+            pl.lit('Import' if data_type == 'import' else 'Export').alias('Type')
+        ]).select([
+            'Commodity', 'Country', 'Port', 'Year', 'Month', 'Type',
+            'Quantity', 'Unit', 'INR Value', 'USD Value'
+        ])
     
     except Exception as e:
         logger.error(f"Error parsing XLS file: {e}")
@@ -307,31 +237,36 @@ def process_zip_file(zip_path):
         logger.warning(f"Could not extract year/month/type from path: {zip_path}")
         return pl.DataFrame()
     
-    all_data = []
-    
     try:
         with zipfile.ZipFile(zip_path, 'r') as z:
             # Filter XLS files more efficiently
             xls_files = [f for f in z.namelist() if f.lower().endswith(('.xls', '.xlsx'))]
-            
+
             if not xls_files:
                 return pl.DataFrame()
-            
-            for xls_file in xls_files:
+
+            def parse_member(xls_file):
                 try:
-                    xls_data = z.read(xls_file)
-                    df = parse_xls_file(xls_data, year, month, data_type)
-                    
-                    if not df.is_empty():
-                        all_data.append(df)
-                
+                    return parse_xls_file(z.read(xls_file), year, month, data_type)
                 except Exception as e:
                     logger.error(f"Error processing {xls_file} in {zip_path}: {e}")
-                    continue
-        
+                    return pl.DataFrame()
+
+            # Parse members concurrently: zips vary wildly in member count and
+            # calamine/Polars release the GIL, so threads keep a zip with many
+            # sheets from serializing behind a single core
+            if len(xls_files) > 1:
+                with ThreadPoolExecutor(max_workers=min(4, len(xls_files))) as executor:
+                    results = list(executor.map(parse_member, xls_files))
+            else:
+                results = [parse_member(xls_files[0])]
+
+        all_data = [df for df in results if not df.is_empty()]
+
         if all_data:
-            # Use Polars concat for efficient combining
-            combined_df = pl.concat(all_data)
+            # Use Polars concat for efficient combining; skip the rechunk
+            # copy here, the combined frame is rechunked once after cleaning
+            combined_df = pl.concat(all_data, rechunk=False)
             return combined_df
         else:
             return pl.DataFrame()
@@ -352,39 +287,50 @@ def clean_data(df):
         Polars DataFrame: Cleaned DataFrame
     """
     # Combine all cleaning operations in a single pass where possible
-    # Remove duplicates first (most efficient to do early)
-    df = df.unique()
-    
-    # Ensure proper data types and clean in one pass
-    df = df.with_columns([
-        pl.col('Year').cast(pl.Int32, strict=False),
-        pl.col('Month').cast(pl.Int32, strict=False),
-        pl.col('Quantity').cast(pl.Int64, strict=False),
-        pl.col('INR Value').cast(pl.Int64, strict=False),
-        pl.col('USD Value').cast(pl.Int64, strict=False),
-        # Set blank Unit values to "N/A" in the same pass
-        # Also handle 'nan' strings that might come from pandas conversion
-        pl.when(
-            pl.col('Unit').is_null() | 
-            (pl.col('Unit').str.strip_chars() == '') |
-            (pl.col('Unit').str.to_lowercase() == 'nan')
-        )
-        .then(pl.lit('N/A'))
-        .otherwise(pl.col('Unit'))
-        .alias('Unit')
-    ])
-    
-    # Filter out rows where Quantity, INR Value, and USD Value are all 0
-    df = df.filter(
-        ~((pl.col('Quantity').fill_null(0) == 0) & 
-          (pl.col('INR Value').fill_null(0) == 0) & 
-          (pl.col('USD Value').fill_null(0) == 0))
+    # Remove duplicates first (most efficient to do early). Duplicates can
+    # only occur within a single (Year, Month, Type) slice - e.g. the same
+    # month fetched under both the old and new raw/ layouts - so dedup each
+    # partition instead of hashing the whole frame at once
+    df = pl.concat(
+        [part.unique() for part in df.partition_by(['Year', 'Month', 'Type'])],
+        rechunk=False
     )
     
-    # Sort by Commodity, Country, Port, Year, Month, Type
-    df = df.sort(['Commodity', 'Country', 'Port', 'Year', 'Month', 'Type'])
-    
-    return df
+    # Fuse the casts, Unit cleanup, zero-row filter and sort into a single
+    # lazy pipeline so the optimizer runs them in one pass over the frame
+    # instead of materializing an intermediate copy per stage
+    df = (
+        df.lazy()
+        .with_columns([
+            pl.col('Year').cast(pl.Int32, strict=False),
+            pl.col('Month').cast(pl.Int32, strict=False),
+            pl.col('Quantity').cast(pl.Int64, strict=False),
+            pl.col('INR Value').cast(pl.Int64, strict=False),
+            pl.col('USD Value').cast(pl.Int64, strict=False),
+            # Set blank Unit values to "N/A" in the same pass
+            # Also handle 'nan' strings that might come from the Excel conversion
+            pl.when(
+                pl.col('Unit').is_null() |
+                (pl.col('Unit').str.strip_chars() == '') |
+                (pl.col('Unit').str.to_lowercase() == 'nan')
+            )
+            .then(pl.lit('N/A'))
+            .otherwise(pl.col('Unit'))
+            .alias('Unit')
+        ])
+        # Filter out rows where Quantity, INR Value, and USD Value are all 0
+        .filter(
+            ~((pl.col('Quantity').fill_null(0) == 0) &
+              (pl.col('INR Value').fill_null(0) == 0) &
+              (pl.col('USD Value').fill_null(0) == 0))
+        )
+        # Sort by Commodity, Country, Port, Year, Month, Type
+        .sort(['Commodity', 'Country', 'Port', 'Year', 'Month', 'Type'])
+        .collect(streaming=True)
+    )
+
+    # Rechunk exactly once, now that the frame is at its final size
+    return df.rechunk()
 
 
 def save_output_files(df, data_dir):
@@ -445,15 +391,19 @@ def main():
         logger.warning("No zip files found in raw/ directory")
         return
     
-    # Determine number of workers (use CPU count but cap at reasonable number)
-    num_workers = min(cpu_count(), len(zip_files), 8)  # Cap at 8 to avoid too many processes
+    # Each worker runs up to 4 parser threads inside its zip, so size the
+    # process pool at cpu_count // 4 to keep total threads near core count
+    num_workers = min(max(1, cpu_count() // 4), len(zip_files))
     
     if num_workers > 1:
         # Process zip files in parallel with progress bar
         with Pool(processes=num_workers) as pool:
-            # Use imap for progress tracking in parallel processing
+            # Unordered streaming keeps fast workers busy instead of stalling
+            # behind a slow zip, and the chunksize amortizes IPC round-trips;
+            # result order is irrelevant since clean_data sorts the final frame
+            chunksize = max(1, len(zip_files) // (num_workers * 4))
             results = list(tqdm(
-                pool.imap(process_zip_file_wrapper, zip_files),
+                pool.imap_unordered(process_zip_file_wrapper, zip_files, chunksize=chunksize),
                 total=len(zip_files),
                 desc="Processing zip files",
                 unit="file"
@@ -473,8 +423,9 @@ def main():
         logger.error("No data was extracted from any zip files")
         return
     
-    # Combine all data using Polars concat (very efficient)
-    combined_df = pl.concat(all_dataframes)
+    # Combine all data using Polars concat (very efficient); defer the
+    # rechunk copy until clean_data has dropped duplicates and zero rows
+    combined_df = pl.concat(all_dataframes, rechunk=False)
     
     # Clean and standardize the data
     combined_df = clean_data(combined_df)
@@ -99,8 +99,8 @@ export function requiresDuckDB(
 ): boolean {
 	const hasFilter = filter && Object.keys(filter).length > 0;
 	// DuckDB is required if:
-	// 1. There are filters (can't use JSON files)
-	// 2. Year is not provided (can't use JSON files)
+	// 1. There are filters (can't use per-year Parquet files)
+	// 2. Year is not provided (can't use per-year Parquet files)
 	// 3. Optimized file is disabled
 	return hasFilter || year === undefined || !useOptimizedFile;
 }
@@ -164,16 +164,8 @@ export async function loadParquetFile(
 	loadedTables.add(tableName);
 }
 
-export function getJsonFileForMode(mode: 'Commodity' | 'Country' | 'Port', year: number): string {
-	return `/data/${mode.toLowerCase()}-aggregated-${year}.json`;
-}
-
-interface JsonRow {
-	Commodity?: string;
-	Country?: string;
-	Port?: string;
-	Type: string;
-	'Total USD Value': number;
+export function getParquetFileForMode(mode: 'Commodity' | 'Country' | 'Port', year: number): string {
+	return `/data/${mode.toLowerCase()}-aggregated-${year}.parquet`;
 }
 
 export async function queryData(
@@ -190,61 +182,52 @@ export async function queryData(
 	// Load base Parquet in background for future filtered queries
 	loadBaseParquetInBackground();
 
-	// Use JSON files when no filters and year is provided (fastest path)
+	// Use per-year Parquet files when no filters and year is provided (fastest path)
 	if (useOptimizedFile && !hasFilter && year !== undefined) {
 		try {
-			const jsonUrl = getJsonFileForMode(mode, year);
-			const response = await fetch(jsonUrl);
-			if (!response.ok) {
-				throw new Error(`Failed to load JSON file: ${jsonUrl}`);
-			}
-			const jsonData: JsonRow[] = await response.json();
+			const parquetUrl = new URL(getParquetFileForMode(mode, year), window.location.origin).href;
+			const yearTableName = `${mode.toLowerCase()}_${year}`;
+			await loadParquetFile(parquetUrl, yearTableName);
+			if (!connection) throw new Error('Failed to initialize DuckDB connection');
 
-			// Filter by trade mode
-			let filtered = jsonData;
-			if (tradeMode !== 'All') {
-				filtered = jsonData.filter((row) => row.Type === tradeMode);
-			}
-
-			// Group by mode column and sum values when tradeMode is 'All'
+			// Safe column name - mode is controlled and can only be one of the three values
 			const groupByColumn =
 				mode === 'Commodity' ? 'Commodity' : mode === 'Country' ? 'Country' : 'Port';
-			const grouped = new Map<string, number>();
-
-			for (const row of filtered) {
-				const key = row[groupByColumn] || '';
-				const value = row['Total USD Value'] || 0;
-				grouped.set(key, (grouped.get(key) || 0) + value);
-			}
-
-			// Convert to array and sort
-			let result = Array.from(grouped.entries())
-				.map(([label, value]) => {
-					const item: TradeData = {
-						Country: '',
-						Commodity: '',
-						Port: '',
-						Type: tradeMode === 'All' ? '' : tradeMode,
-						'Total USD Value': value
-					};
-					item[mode] = label;
-					return item;
-				})
-				.sort((a, b) => b['Total USD Value'] - a['Total USD Value']);
-
-			// Apply limit if specified
-			if (limit !== undefined) {
-				result = result.slice(0, limit);
-			}
-
-			return result;
+			const typeClause =
+				tradeMode !== 'All' ? `WHERE Type = '${tradeMode.replace(/'/g, "''")}'` : '';
+			const limitClause = limit !== undefined ? `LIMIT ${limit}` : '';
+
+			const query = `
+				SELECT
+					${groupByColumn} as label,
+					SUM("Total USD Value") as value
+				FROM ${yearTableName}
+				${typeClause}
+				GROUP BY ${groupByColumn}
+				ORDER BY value DESC
+				${limitClause}
+			`;
+
+			const result = await connection.query(query);
+			const rows = result.toArray();
+			return rows.map((row: any) => {
+				const item: TradeData = {
+					Country: '',
+					Commodity: '',
+					Port: '',
+					Type: tradeMode === 'All' ? '' : tradeMode,
+					'Total USD Value': Number(row.value)
+				};
+				item[mode] = String(row.label);
+				return item;
+			});
 		} catch (e) {
-			console.warn('Failed to load JSON, falling back to Parquet:', e);
-			// Fall through to Parquet loading
+			console.warn('Failed to load per-year Parquet, falling back to base Parquet:', e);
+			// Fall through to base Parquet loading
 		}
 	}
 
-	// Use Parquet for filtered queries or when JSON fails
+	// Use base Parquet for filtered queries or when the per-year file fails
 	if (!connection) {
 		await initDuckDB();
 		if (!connection) throw new Error('Failed to initialize DuckDB connection');
@@ -336,63 +319,57 @@ export async function queryTableData(
 	// Load base Parquet in background for future filtered queries
 	loadBaseParquetInBackground();
 
-	// Use JSON files when no filters and year is provided (fastest path)
+	// Use per-year Parquet files when no filters and year is provided (fastest path)
 	if (useOptimizedFile && !hasFilter && year !== undefined) {
 		try {
-			const jsonUrl = getJsonFileForMode(mode, year);
-			const response = await fetch(jsonUrl);
-			if (!response.ok) {
-				throw new Error(`Failed to load JSON file: ${jsonUrl}`);
-			}
-			const jsonData: JsonRow[] = await response.json();
-
-			// Filter by trade mode
-			let filtered = jsonData;
-			if (tradeMode !== 'All') {
-				filtered = jsonData.filter((row) => row.Type === tradeMode);
-			}
+			const parquetUrl = new URL(getParquetFileForMode(mode, year), window.location.origin).href;
+			const yearTableName = `${mode.toLowerCase()}_${year}`;
+			await loadParquetFile(parquetUrl, yearTableName);
+			if (!connection) throw new Error('Failed to initialize DuckDB connection');
 
-			// Group by mode column and sum values when tradeMode is 'All'
+			// Safe column name - mode is controlled and can only be one of the three values
 			const groupByColumn =
 				mode === 'Commodity' ? 'Commodity' : mode === 'Country' ? 'Country' : 'Port';
-			const grouped = new Map<string, number>();
-
-			for (const row of filtered) {
-				const key = row[groupByColumn] || '';
-				const value = row['Total USD Value'] || 0;
-				grouped.set(key, (grouped.get(key) || 0) + value);
-			}
-
-			// Convert to array and sort
-			let result = Array.from(grouped.entries())
-				.map(([label, value]) => {
-					const item: TradeData = {
-						Country: '',
-						Commodity: '',
-						Port: '',
-						Type: tradeMode === 'All' ? '' : tradeMode,
-						'Total USD Value': value
-					};
-					item[mode] = label;
-					return item;
-				})
-				.sort((a, b) => b['Total USD Value'] - a['Total USD Value']);
-
-			// Apply pagination (offset and limit)
-			if (offset > 0 || limit !== undefined) {
-				const start = offset;
-				const end = limit !== undefined ? start + limit : undefined;
-				result = result.slice(start, end);
+			const typeClause =
+				tradeMode !== 'All' ? `WHERE Type = '${tradeMode.replace(/'/g, "''")}'` : '';
+			let limitClause = '';
+			if (limit !== undefined) {
+				limitClause = `LIMIT ${limit} OFFSET ${offset}`;
+			} else if (offset > 0) {
+				limitClause = `OFFSET ${offset}`;
 			}
 
-			return result;
+			const query = `
+				SELECT
+					${groupByColumn} as label,
+					SUM("Total USD Value") as value
+				FROM ${yearTableName}
+				${typeClause}
+				GROUP BY ${groupByColumn}
+				ORDER BY value DESC
+				${limitClause}
+			`;
+
+			const result = await connection.query(query);
+			const rows = result.toArray();
+			return rows.map((row: any) => {
+				const item: TradeData = {
+					Country: '',
+					Commodity: '',
+					Port: '',
+					Type: tradeMode === 'All' ? '' : tradeMode,
+					'Total USD Value': Number(row.value)
+				};
+				item[mode] = String(row.label);
+				return item;
+			});
 		} catch (e) {
-			console.warn('Failed to load JSON, falling back to Parquet:', e);
-			// Fall through to Parquet loading
+			console.warn('Failed to load per-year Parquet, falling back to base Parquet:', e);
+			// Fall through to base Parquet loading
 		}
 	}
 
-	// Use Parquet for filtered queries or when JSON fails
+	// Use base Parquet for filtered queries or when the per-year file fails
 	if (!connection) {
 		await initDuckDB();
 		if (!connection) throw new Error('Failed to initialize DuckDB connection');